@@ -1,7 +1,7 @@
 """
 Environment configuration for Code Documentation Assistant
 """
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 
@@ -27,19 +27,47 @@ class Settings(BaseSettings):
     top_k_documents: int = 5
     chunking_strategy: str = "auto"  # Options: 'auto', 'ast', 'lines'
     embedding_backend: str = "sentence-transformers"  # Options: 'openai', 'sentence-transformers'
+    embedding_batch_size: int = 64  # Texts per forward pass when embedding in bulk
+    embedding_cache_enabled: bool = True  # Reuse float16 embeddings cached in backend/.embedding_cache.sqlite
+    embedding_cache_max_entries: int = 200000  # Least recently used embeddings are evicted beyond this
+    chroma_batch_size: int = 512  # Chunks embedded and written to Chroma per add() call
+    chroma_host: str = ''  # Chroma server host; empty uses the embedded client
+    chroma_port: int = 8000  # Chroma server port
+    chroma_write_concurrency: int = 4  # Concurrent writes in flight when talking to a Chroma server
+    hnsw_m: int = 32  # Graph edges per node; higher improves recall at the cost of memory and build time. Existing collections need a rebuild
+    hnsw_construction_ef: int = 200  # Candidate list size while building the index. Existing collections need a rebuild
+    hnsw_search_ef: int = 64  # Candidate list size per query; raise for recall, lower for latency. Applied to existing collections on startup
+    hnsw_num_threads: int = 0  # Threads used to build the index; 0 uses os.cpu_count()
+    chunk_cache_enabled: bool = True  # Reuse chunks cached under backend/.chunk_cache for files whose content hash is unchanged
+    chunk_cache_max_entries: int = 50000  # Least recently used file chunk entries are evicted beyond this
+    ingest_workers: int = 0  # Parallel workers for reading and chunking files; 0 uses os.cpu_count()
+    query_cache_enabled: bool = True  # Serve repeated or near-duplicate queries from memory
+    query_cache_size: int = 1024  # Entries kept in each query cache tier
+    semantic_cache_threshold: float = 0.95  # Cosine similarity above which a prior query's results are reused
+    query_batch_window_ms: float = 5.0  # Concurrent queries arriving within this window share one Chroma call; 0 disables
+    usearch_dtype: str = "f16"  # Stored vector precision for the usearch store. Options: 'f32', 'f16', 'i8'
+    usearch_connectivity: int = 16  # Graph edges per node in the usearch HNSW index
+    usearch_expansion_add: int = 128  # Candidate list size while inserting into the usearch index
     
     # LLM Backend
     llm_backend: str = "local-quantized"  # Options: 'openai', 'ollama'
     ollama_model: str = "llama2"  # Default Ollama model name
-    local_quantized_model_path: str = "backend/models/llama-2-7b-chat.Q4_K_M.gguf"  # Path to local quantized model (e.g., GGML/GPTQ)
+    local_quantized_model_path: str = "backend/models/llama-2-7b-chat.Q4_K_M.gguf"  # Path to local quantized model (e.g., GGML/GPTQ); Q5_K_M trades speed for quality, Q4_0 the reverse
+    local_llm_n_ctx: int = 4096  # Context window for the local model
+    local_llm_n_threads: int = 0  # CPU threads for local inference; 0 uses os.cpu_count()
+    local_llm_n_batch: int = 512  # Prompt tokens evaluated per batch
     
     # Observability
     enable_logging: bool = True
     log_level: str = "INFO"
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    # Frozen: assigning to a setting after load raises instead of silently changing shared config
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
 
 
 settings = Settings()
+
+# Hot-path settings hoisted to module constants for the chunking loop
+CHUNK_SIZE = settings.chunk_size
+CHUNK_OVERLAP = settings.chunk_overlap
+CHUNKING_STRATEGY = settings.chunking_strategy
@@ -0,0 +1,118 @@
+"""
+Persistent embedding cache
+Stores embeddings in sqlite keyed by a hash of the model and text so unchanged chunks skip re-embedding
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from backend.config import settings
+from backend.logger import get_logger
+from backend.source_cache import eviction_target
+
+logger = get_logger(__name__)
+
+EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".embedding_cache.sqlite")
+# Stay under sqlite's limit on bound parameters per statement
+SQLITE_MAX_PARAMS = 500
+
+
+def get_embedding_key(model: str, text: str) -> bytes:
+    """Build a BLAKE2b key for text embedded by the given model."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8', errors='surrogatepass'))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """sqlite-backed map of embedding key -> float16 vector bytes, evicting least recently used entries"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 0):
+        self.path = path or EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB, used REAL)")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(embeddings)")]
+        if 'used' not in columns:
+            self.db.execute("ALTER TABLE embeddings ADD COLUMN used REAL DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+        self.db.commit()
+        self._count = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # Logical clock for recency; strictly increasing, unlike wall-clock time
+        self._clock = self.db.execute("SELECT COALESCE(MAX(used), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """Return cached vectors for whichever keys are present, marking them recently used."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                batch = keys[start:start + SQLITE_MAX_PARAMS]
+                rows = self.db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float16).astype(np.float32).tolist()
+            if found and self.max_entries > 0:
+                try:
+                    with self.db:
+                        self._clock += 1
+                        now = self._clock
+                        self.db.executemany("UPDATE embeddings SET used = ? WHERE key = ?",
+                                            [(now, key) for key in found])
+                except sqlite3.Error as e:
+                    logger.warning("Failed to update embedding cache", path=self.path, error=str(e))
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: List[List[float]]):
+        """Store vectors as float16 in a single transaction, evicting beyond max_entries."""
+        vectors = [np.asarray(vector, dtype=np.float16).tobytes() for vector in vectors]
+        try:
+            with self._lock, self.db:
+                self._clock += 1
+                rows = [(key, vector, self._clock) for key, vector in zip(keys, vectors)]
+                self.db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)", rows)
+                self._count += len(rows)
+                if self.max_entries > 0 and self._count > self.max_entries:
+                    self._evict()
+        except sqlite3.Error as e:
+            logger.warning("Failed to write embedding cache", path=self.path, error=str(e))
+
+    def _evict(self):
+        # The running count overestimates after replacements, so recount before deleting
+        self._count = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+        target = eviction_target(self.max_entries)
+        self.db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)",
+            (self._count - target,)
+        )
+        self._count = target
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Shared cache instance, opened on first use"""
+    if not hasattr(get_embedding_cache, '_cache'):
+        get_embedding_cache._cache = EmbeddingCache(max_entries=settings.embedding_cache_max_entries)
+    return get_embedding_cache._cache
+
+
+def cached_embeddings(texts: List[str], model: str, compute: Callable[[List[str]], List[list]],
+                      cache: EmbeddingCache = None) -> List[list]:
+    """Embed texts, computing only those missing from the cache in one call to compute."""
+    cache = cache or get_embedding_cache()
+    keys = [get_embedding_key(model, text) for text in texts]
+    found = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        computed = compute([texts[i] for i in missing])
+        missing_keys = [keys[i] for i in missing]
+        cache.put_many(missing_keys, computed)
+        found.update(zip(missing_keys, computed))
+    logger.debug("Embedding cache lookup", hits=len(texts) - len(missing), misses=len(missing))
+    return [found[key] for key in keys]
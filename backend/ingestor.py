@@ -3,18 +3,27 @@ Code ingestion and processing module
 Handles reading code files, parsing, and chunking
 """
 import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from backend.logger import get_logger
-from backend.config import settings
+from backend.config import settings, CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_STRATEGY
+from backend import source_cache
+from backend.source_cache import load_file_chunks, store_file_chunks
 import ast
-from collections import defaultdict
+import hashlib
+import multiprocessing
+import pickle
+from collections import defaultdict, deque
 from charset_normalizer import from_bytes
-from chromadb import Client
+import numpy as np
 
 
 logger = get_logger(__name__)
 
+INGEST_STATE_PATH = os.path.join(os.path.dirname(__file__), ".ingest_state.pkl")
+
 
 class CodeDocument:
     """Represents a code document with metadata"""
@@ -23,15 +32,15 @@ class CodeDocument:
         self.path = path
         self.content = content
         self.file_type = file_type
-        self.chunk_size = settings.chunk_size
-        self.chunk_overlap = settings.chunk_overlap
+        self.chunk_size = CHUNK_SIZE
+        self.chunk_overlap = CHUNK_OVERLAP
     
     def chunk(self) -> List[Dict[str, Any]]:
         """
         Chunk document into smaller pieces for embedding
         Strategy is configurable: 'ast' (default for .py), 'lines', or 'auto'.
         """
-        strategy = getattr(settings, 'chunking_strategy', 'auto')
+        strategy = CHUNKING_STRATEGY
         if strategy == 'lines':
             return self._chunk_by_lines()
         elif strategy == 'ast':
@@ -57,8 +66,10 @@ class CodeDocument:
                     if isinstance(node, ast.Import):
                         for n in node.names:
                             imports.append(n.name)
-                    elif isinstance(node, ast.ImportFrom):
+                    elif isinstance(node, ast.ImportFrom) and node.module:
                         imports.append(node.module)
+            # Joined once per file and shared by every chunk, matching the flat form Chroma stores
+            imports = ",".join(imports)
             if module_docstring:
                 chunks.append({
                     'content': f"# Module docstring\n{module_docstring}",
@@ -70,6 +81,20 @@ class CodeDocument:
                         'imports': imports
                     }
                 })
+            # Collect function calls for all top-level defs in a single pre-order traversal.
+            # Dicts act as insertion-ordered sets so calls keep source order across runs.
+            calls_by_node_id = defaultdict(dict)
+            stack = [(node, id(node)) for node in ast.iter_child_nodes(tree)
+                     if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+            while stack:
+                subnode, owner_id = stack.pop()
+                if isinstance(subnode, ast.Call):
+                    if isinstance(subnode.func, ast.Name):
+                        calls_by_node_id[owner_id][subnode.func.id] = None
+                    elif isinstance(subnode.func, ast.Attribute):
+                        calls_by_node_id[owner_id][subnode.func.attr] = None
+                stack.extend((child, owner_id) for child in reversed(list(ast.iter_child_nodes(subnode))))
+            lines = self.content.splitlines()
             for node in ast.iter_child_nodes(tree):
                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
                     start_line = node.lineno - 1
@@ -80,19 +105,12 @@ class CodeDocument:
                         if idx + 1 < len(siblings):
                             end_line = siblings[idx + 1].lineno - 1
                         else:
-                            end_line = len(self.content.splitlines())
-                    code_lines = self.content.splitlines()[start_line:end_line]
+                            end_line = len(lines)
+                    code_lines = lines[start_line:end_line]
                     code_chunk = '\n'.join(code_lines)
                     chunk_type = 'class' if isinstance(node, ast.ClassDef) else 'function'
                     name = getattr(node, 'name', 'unknown')
-                    # Extract function calls within this node
-                    calls = []
-                    for subnode in ast.walk(node):
-                        if isinstance(subnode, ast.Call):
-                            if isinstance(subnode.func, ast.Name):
-                                calls.append(subnode.func.id)
-                            elif isinstance(subnode.func, ast.Attribute):
-                                calls.append(subnode.func.attr)
+                    calls = list(calls_by_node_id.get(id(node), ()))
                     chunks.append({
                         'content': code_chunk,
                         'metadata': {
@@ -101,25 +119,29 @@ class CodeDocument:
                             'chunk_type': chunk_type,
                             'name': name,
                             'chunk_index': len(chunks),
-                            'calls': list(set(calls)),
+                            'calls': calls,
                             'imports': imports
                         }
                     })
         except Exception as e:
             logger.warning(f"AST chunking failed, falling back to line-based chunking", file=self.path, error=str(e))
             return self._chunk_by_lines()
-        return chunks if chunks else self._chunk_by_lines()
+        if not chunks:
+            return self._chunk_by_lines()
+        return chunks
 
     def _chunk_by_lines(self) -> List[Dict[str, Any]]:
         """Fallback: chunk by lines with overlap (original logic)."""
         chunks = []
         lines = self.content.split('\n')
+        keep_lines = self.chunk_overlap // 50
         chunk_lines = []
-        for i, line in enumerate(lines):
+        chunk_len = -1  # len('\n'.join(chunk_lines)), tracked incrementally
+        for line in lines:
             chunk_lines.append(line)
-            chunk_text = '\n'.join(chunk_lines)
-            if len(chunk_text) > self.chunk_size:
-                overlap_lines = max(len(chunk_lines) - self.chunk_overlap // 50, 0)
+            chunk_len += len(line) + 1
+            if chunk_len > self.chunk_size:
+                overlap_lines = max(len(chunk_lines) - keep_lines, 0)
                 chunk_text = '\n'.join(chunk_lines)
                 chunks.append({
                     'content': chunk_text,
@@ -131,6 +153,7 @@ class CodeDocument:
                     }
                 })
                 chunk_lines = chunk_lines[overlap_lines:]
+                chunk_len = sum(len(l) + 1 for l in chunk_lines) - 1
         if chunk_lines:
             chunk_text = '\n'.join(chunk_lines)
             chunks.append({
@@ -146,26 +169,114 @@ class CodeDocument:
         return chunks
 
 
+def _split_names(value) -> List[str]:
+    """Normalize a names field that may be a list or a comma-separated string (as stored in Chroma)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return value.split(',')
+    return value
+
+
+def chunk_file(path: str, content: str, file_type: str) -> List[Dict[str, Any]]:
+    """Chunk file content without keeping a CodeDocument (and its content) around"""
+    return CodeDocument(path, content, file_type).chunk()
+
+
+def _decode_file(file_path: Path, raw_data: bytes) -> str:
+    """Decode raw file bytes into text"""
+    try:
+        # Nearly all source files are ASCII/UTF-8; only run charset detection when that fails
+        try:
+            content = raw_data.decode('utf-8')
+        except UnicodeDecodeError:
+            result = from_bytes(raw_data).best()
+            encoding = result.encoding if result else 'utf-8'
+            content = raw_data.decode(encoding, errors='ignore')
+        logger.debug(f"Ingested file", 
+                    file=str(file_path), 
+                    size_bytes=len(content))
+        return content
+    except Exception as e:
+        logger.error(f"Error reading file", 
+                   file=str(file_path), 
+                   error=str(e))
+        raise
+
+
+def _read_bytes(file_path: Union[str, Path]) -> bytes:
+    """Read a file's raw bytes"""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def _load_and_chunk(file_path: Union[str, Path],
+                    raw_data: Optional[bytes] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Read and chunk a single file; module-level so pool workers can pickle it
+    Returns lightweight document info and the chunks; the file content itself is dropped
+    here. Chunks are cached under the SHA-256 of the file bytes, so an unchanged file is
+    never re-parsed, even after a rename or copy. raw_data may be passed when the bytes
+    were already read ahead.
+    """
+    file_path = Path(file_path)
+    if raw_data is None:
+        raw_data = _read_bytes(file_path)
+    path = str(file_path)
+    file_type = file_path.suffix.lower()
+    content = _decode_file(file_path, raw_data)
+    doc_info = {'file_path': path, 'file_type': file_type, 'size_bytes': len(content)}
+    if not settings.chunk_cache_enabled:
+        return doc_info, chunk_file(path, content, file_type)
+    digest = hashlib.sha256(raw_data).hexdigest()
+    chunks = load_file_chunks(path, digest)
+    if chunks is None:
+        chunks = chunk_file(path, content, file_type)
+        store_file_chunks(digest, chunks, settings.chunk_cache_max_entries)
+    return doc_info, chunks
+
+
+def _init_worker(chunk_cache_dir: str):
+    """Point a pool worker at the parent's chunk cache directory"""
+    source_cache.CHUNK_CACHE_DIR = chunk_cache_dir
+
+
 class CodebaseIngestor:
     """Ingests and processes codebases"""
     
-    SUPPORTED_EXTENSIONS = {
+    SUPPORTED_EXTENSIONS = frozenset({
         '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', 
         '.h', '.go', '.rs', '.rb', '.php', '.swift', '.kt', '.scala',
         '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.md',
         '.txt', '.sh', '.bash'
-    }
+    })
+    # Extensions without the leading dot, for matching raw directory entry names
+    _SUPPORTED_EXTENSION_NAMES = frozenset(ext[1:] for ext in SUPPORTED_EXTENSIONS)
     
     IGNORE_DIRS = {
         '__pycache__', '.git', 'node_modules', '.venv', 'venv',
         'dist', 'build', '.pytest_cache', 'htmlcov'
     }
     
+    # Skip dot-directories (.git, .tox, .idea, ...) even when not listed above
+    SKIP_HIDDEN_DIRS = True
+    
+    # Below this many files, worker start-up costs more than it saves
+    PARALLEL_MIN_FILES = 16
+    PROCESS_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    
+    # Read-ahead used when chunking inline: reader threads and files buffered ahead of the parser
+    READ_THREADS = 4
+    READ_AHEAD = 32
+    
     def __init__(self):
-        self.documents: List[CodeDocument] = []
+        self.documents: List[Dict[str, Any]] = []  # file_path, file_type, size_bytes per ingested file
         self.chunks: List[Dict[str, Any]] = []
         self.function_index = defaultdict(list)  # name -> list of (file_path, chunk_index)
         self.class_index = defaultdict(list)     # name -> list of (file_path, chunk_index)
+        self._chunk_by_key: Dict[Tuple[str, int], Dict[str, Any]] = {}  # (file_path, chunk_index) -> chunk
+        self._docstring_by_module = defaultdict(list)  # module name -> list of module docstring chunks
+        self._last_chunks: List[Dict[str, Any]] = []  # chunks added by the most recent ingest call
     
     def ingest_directory(self, directory_path: str) -> int:
         """
@@ -180,41 +291,22 @@ class CodebaseIngestor:
         
         logger.info(f"Starting ingestion of directory", path=str(directory_path))
         
-        for file_path in directory_path.rglob('*'):
-            # Skip directories and ignored paths
-            if file_path.is_dir():
-                if file_path.name in self.IGNORE_DIRS:
-                    continue
-                continue
-            
-            # Skip unsupported file types
-            if file_path.suffix.lower() not in self.SUPPORTED_EXTENSIONS:
-                continue
-            
-            try:
-                self._ingest_file(file_path)
-            except Exception as e:
-                logger.error(f"Failed to ingest file", 
-                           file=str(file_path), error=str(e))
-                continue
+        # Plain path strings; Path objects are only built once a file is opened
+        file_paths = list(self._walk(str(directory_path)))
         
-        # Chunk all documents
-        for doc in self.documents:
-            doc_chunks = doc.chunk()
-            self.chunks.extend(doc_chunks)
-            # Build function/class index for cross-file lookup
-            for chunk in doc_chunks:
-                meta = chunk.get('metadata', {})
-                if meta.get('chunk_type') == 'function' and meta.get('name'):
-                    self.function_index[meta['name']].append((meta['file_path'], meta['chunk_index']))
-                if meta.get('chunk_type') == 'class' and meta.get('name'):
-                    self.class_index[meta['name']].append((meta['file_path'], meta['chunk_index']))
+        # Read and chunk files concurrently, then build the indexes in one pass
+        docs = []
+        new_chunks = []
+        for doc, doc_chunks in self._load_files(file_paths):
+            docs.append(doc)
+            new_chunks.extend(doc_chunks)
+        self._add_documents(docs, new_chunks)
         
         logger.info(f"Ingestion complete", 
-                   files_processed=len(self.documents),
+                   files_processed=len(docs),
                    total_chunks=len(self.chunks))
         
-        return len(self.documents)
+        return len(docs)
     
     def ingest_file(self, file_path: str) -> int:
         """Ingest a single file"""
@@ -222,80 +314,235 @@ class CodebaseIngestor:
         if not file_path.exists():
             raise ValueError(f"File not found: {file_path}")
         
-        self._ingest_file(file_path)
-        
-        # Chunk the document
-        for doc in self.documents:
-            self.chunks.extend(doc.chunk())
+        # Read and chunk the document
+        doc_info, doc_chunks = _load_and_chunk(file_path)
+        self._add_documents([doc_info], doc_chunks)
         
         return len(self.documents)
     
-    def _ingest_file(self, file_path: Path):
-        """Internal method to read and parse a file"""
+    def _walk(self, directory: str) -> Iterator[str]:
+        """
+        Yield supported files under a directory
+        Ignored and hidden directories are pruned before descending into them
+        """
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name in self.IGNORE_DIRS:
+                                continue
+                            if self.SKIP_HIDDEN_DIRS and entry.name.startswith('.'):
+                                continue
+                            stack.append(entry.path)
+                        else:
+                            stem, _, ext = entry.name.rpartition('.')
+                            if stem and ext.lower() in self._SUPPORTED_EXTENSION_NAMES and entry.is_file():
+                                yield entry.path
+            except OSError as e:
+                logger.warning("Failed to scan directory", path=current, error=str(e))
+    
+    def _load_files(self, file_paths: List[str]) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Read and chunk files, yielding (document info, chunks) in input order
+        Python files are parsed in worker processes; other files are chunked on threads
+        """
+        workers = settings.ingest_workers or os.cpu_count() or 1
+        if workers <= 1 or len(file_paths) < self.PARALLEL_MIN_FILES:
+            # Chunk inline, with the next files' reads in flight so I/O overlaps parsing
+            for file_path, read in self._read_ahead(file_paths):
+                try:
+                    yield _load_and_chunk(file_path, read.result())
+                except Exception as e:
+                    logger.error(f"Failed to ingest file", 
+                               file=str(file_path), error=str(e))
+            return
+        
         try:
-            # Detect encoding using charset-normalizer
-            #from charset_normalizer import from_bytes
-            with open(file_path, 'rb') as f:
-                raw_data = f.read()
-                result = from_bytes(raw_data).best()
-                encoding = result.encoding if result else 'utf-8'
-            # Read file content
-            with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-                content = f.read()
-            file_type = file_path.suffix.lower()
-            relative_path = str(file_path)
-            doc = CodeDocument(relative_path, content, file_type)
-            self.documents.append(doc)
-            logger.debug(f"Ingested file", 
-                        file=relative_path, 
-                        size_bytes=len(content))
-        except Exception as e:
-            logger.error(f"Error reading file", 
-                       file=str(file_path), 
-                       error=str(e))
-            raise
+            # Never fork the server: it is multi-threaded (uvicorn, Chroma, torch)
+            process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(self.PROCESS_START_METHOD),
+                initializer=_init_worker,
+                initargs=(source_cache.CHUNK_CACHE_DIR,),
+            )
+        except (OSError, NotImplementedError) as e:
+            logger.warning("Process pool unavailable, chunking on threads", error=str(e))
+            process_pool = None
+        broken = False
+        with ThreadPoolExecutor(max_workers=workers) as thread_pool:
+            def submit(file_path: str) -> Tuple[Future, bool]:
+                """Submit a file, returning its future and whether it runs in a worker process"""
+                nonlocal broken
+                if process_pool and not broken and file_path.lower().endswith('.py'):
+                    try:
+                        return process_pool.submit(_load_and_chunk, file_path), True
+                    except BrokenProcessPool:
+                        broken = True
+                return thread_pool.submit(_load_and_chunk, file_path), False
+            
+            try:
+                futures = [(file_path, *submit(file_path)) for file_path in file_paths]
+                i = 0
+                while i < len(futures):
+                    file_path, future, _ = futures[i]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        # A worker died, e.g. killed for memory or failing to import an unguarded __main__
+                        # under forkserver/spawn. Re-run this and every unfinished Python file on threads
+                        logger.warning("Process pool broke, chunking remaining files on threads", error=str(e))
+                        broken = True
+                        for j in range(i, len(futures)):
+                            path, pending, in_process = futures[j]
+                            if in_process and not (pending.done() and pending.exception() is None):
+                                futures[j] = (path, *submit(path))
+                        continue
+                    except Exception as e:
+                        logger.error(f"Failed to ingest file", 
+                                   file=str(file_path), error=str(e))
+                        i += 1
+                        continue
+                    i += 1
+                    yield result
+            finally:
+                if process_pool:
+                    process_pool.shutdown(cancel_futures=True)
+    
+    def _add_documents(self, docs: List[Dict[str, Any]], chunks: List[Dict[str, Any]]):
+        """Add newly chunked documents, replacing anything previously ingested from the same files"""
+        paths = {doc['file_path'] for doc in docs}
+        if any(doc['file_path'] in paths for doc in self.documents) or any(
+                c['metadata']['file_path'] in paths for c in self.chunks):
+            self.documents = [doc for doc in self.documents if doc['file_path'] not in paths]
+            self.chunks = [c for c in self.chunks if c['metadata']['file_path'] not in paths]
+            self._rebuild_indexes()
+        self.documents.extend(docs)
+        self.chunks.extend(chunks)
+        self._index_chunks(chunks)
+        self._last_chunks = chunks
+    
+    def _rebuild_indexes(self):
+        """Rebuild all lookup indexes from the current chunks"""
+        self.function_index.clear()
+        self.class_index.clear()
+        self._chunk_by_key.clear()
+        self._docstring_by_module.clear()
+        self._index_chunks(self.chunks)
+    
+    def _read_ahead(self, file_paths: List[str]) -> Iterator[Tuple[str, Future]]:
+        """Yield (file_path, future of its bytes) in order, keeping up to READ_AHEAD reads in flight"""
+        with ThreadPoolExecutor(max_workers=self.READ_THREADS) as pool:
+            pending = deque()
+            for file_path in file_paths:
+                pending.append((file_path, pool.submit(_read_bytes, file_path)))
+                if len(pending) >= self.READ_AHEAD:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+    
+    def _index_chunks(self, chunks: List[Dict[str, Any]]):
+        """Build function/class index and chunk lookups for cross-file reasoning"""
+        for chunk in chunks:
+            meta = chunk.get('metadata', {})
+            self._chunk_by_key[(meta.get('file_path'), meta.get('chunk_index'))] = chunk
+            if meta.get('chunk_type') == 'module_docstring':
+                self._docstring_by_module[Path(meta['file_path']).stem].append(chunk)
+            if meta.get('chunk_type') == 'function' and meta.get('name'):
+                self.function_index[meta['name']].append((meta['file_path'], meta['chunk_index']))
+            if meta.get('chunk_type') == 'class' and meta.get('name'):
+                self.class_index[meta['name']].append((meta['file_path'], meta['chunk_index']))
     
     def get_chunks(self) -> List[Dict[str, Any]]:
         """Get all chunks"""
         return self.chunks
     
-    def get_documents(self) -> List[CodeDocument]:
-        """Get all documents"""
+    def get_last_ingested_chunks(self) -> List[Dict[str, Any]]:
+        """Get the chunks added by the most recent ingest call"""
+        return self._last_chunks
+    
+    def get_documents(self) -> List[Dict[str, Any]]:
+        """Get metadata (file_path, file_type, size_bytes) for all ingested documents"""
         return self.documents
+    
+    def save_state(self, path: str = INGEST_STATE_PATH):
+        """Persist ingested chunks so indexes survive a restart (file contents are not saved)"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info("Saved ingest state", path=path, chunks=len(self.chunks))
+    
+    def load_state(self, path: str = INGEST_STATE_PATH) -> bool:
+        """Restore chunks saved by save_state and rebuild the lookup indexes"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                self.chunks = pickle.load(f)
+        except Exception as e:
+            logger.warning("Failed to load ingest state", path=path, error=str(e))
+            return False
+        self._rebuild_indexes()
+        logger.info("Loaded ingest state", path=path, chunks=len(self.chunks))
+        return True
 
     def get_related_chunks(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Given a chunk, find related chunks (e.g., called functions/classes) for cross-file reasoning."""
         related = []
         meta = chunk.get('metadata', {})
         # Add called functions
-        for func in meta.get('calls', []):
-            for file_path, chunk_idx in self.function_index.get(func, []):
-                for c in self.chunks:
-                    m = c.get('metadata', {})
-                    if m.get('file_path') == file_path and m.get('chunk_index') == chunk_idx:
-                        related.append(c)
-        # Add imported modules' docstrings if available
-        for mod in meta.get('imports', []):
-            for c in self.chunks:
-                m = c.get('metadata', {})
-                if m.get('chunk_type') == 'module_docstring' and mod and mod in m.get('file_path', ''):
+        for func in _split_names(meta.get('calls')):
+            for key in self.function_index.get(func, []):
+                c = self._chunk_by_key.get(key)
+                if c is not None:
                     related.append(c)
+        # Add imported modules' docstrings if available, matched on the module's file name
+        for mod in _split_names(meta.get('imports')):
+            if mod:
+                related.extend(self._docstring_by_module.get(mod.rsplit('.', 1)[-1], []))
         return related
 
 
 def add_chunks_to_chroma(chunks, vector_store=None):
+    """Embed chunks and add them to a Chroma collection in fixed-size batches"""
+    from backend.llm_utils import get_embeddings
     if(vector_store is not None):
         collection = vector_store
     else:
-        client = Client()
-        collection = client.get_or_create_collection(name="chroma_docs")
-    ids = [f"{chunk['metadata']['file_path']}:{chunk['metadata']['chunk_index']}" for chunk in chunks]
-    documents = [chunk['content'] for chunk in chunks]
-    # Sanitize metadata: convert lists to comma-separated strings
-    def sanitize_metadata(meta):
-        return {k: (",".join(v) if isinstance(v, list) else v) for k, v in meta.items()}
-    metadatas = [sanitize_metadata(chunk['metadata']) for chunk in chunks]
-    collection.add(ids=ids, documents=documents, metadatas=metadatas)
-    #print colection metadata for debugging
-    print("Chroma Collection Metadata:", collection.count)
-    print("collectin info:", collection.get())
+        from backend.vector_store import get_vector_store
+        collection = get_vector_store()
+    def prepare_batch(batch):
+        # Build ids, documents and metadatas in a single pass over the batch
+        ids, documents, metadatas = [], [], []
+        for chunk in batch:
+            meta = chunk['metadata']
+            ids.append(f"{meta['file_path']}:{meta['chunk_index']}")
+            documents.append(chunk['content'])
+            # Sanitize metadata: convert lists to comma-separated strings
+            metadatas.append({k: (",".join(v) if type(v) is list else v) for k, v in meta.items()})
+        # Embed up front rather than letting Chroma embed one document at a time; float32 arrays
+        # are what Chroma stores, so it need not convert a Python float per dimension
+        return ids, documents, metadatas, np.asarray(get_embeddings(documents), dtype=np.float32)
+    batch_size = settings.chroma_batch_size
+    starts = range(0, len(chunks), batch_size)
+    added = 0
+    # Embed the next batch on a worker thread while the current batch is written
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(prepare_batch, chunks[:batch_size]) if chunks else None
+        for start in starts:
+            future = pending
+            next_start = start + batch_size
+            pending = executor.submit(prepare_batch, chunks[next_start:next_start + batch_size]) if next_start < len(chunks) else None
+            try:
+                ids, documents, metadatas, embeddings = future.result()
+                # Ids are deterministic (path:chunk_index), so re-ingesting a file overwrites its entries
+                collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+                added += len(ids)
+            except Exception as e:
+                logger.error("Failed to add chunk batch to Chroma", 
+                           batch_start=start, error=str(e))
+    logger.info("Added chunks to Chroma", chunks=added, total=len(chunks))
+    return added
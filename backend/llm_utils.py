@@ -15,6 +15,13 @@ logger = get_logger(__name__)
 SENTENCE_TRANSFORMERS_DIR = os.path.join(os.path.dirname(__file__), "models", "sentence_transformers")
 os.makedirs(SENTENCE_TRANSFORMERS_DIR, exist_ok=True)
 
+# Static instructions kept at the very start of every prompt so local backends
+# (llama.cpp) can reuse the KV cache for this shared prefix across questions
+SYSTEM_PROMPT = "You are a helpful code documentation assistant. Use the following code context to answer the user's question. If the answer is not in the context, say you don't know."
+
+# Maximum number of inputs accepted by a single OpenAI embeddings request
+OPENAI_EMBEDDING_BATCH_LIMIT = 2048
+
 def get_sentence_transformers_model(model_name: str):
     """Download and cache the sentence-transformers model locally, then load from local dir."""
     local_model_path = os.path.join(SENTENCE_TRANSFORMERS_DIR, model_name)
@@ -28,27 +35,61 @@ def get_sentence_transformers_model(model_name: str):
 
 def get_embedding(text: str) -> list:
     """Get embedding for a text chunk using the configured backend (OpenAI or Sentence-BERT)."""
+    # Single texts are mostly user questions: caching them on disk would keep every question
+    # forever and put a sqlite commit on the request path
+    return _compute_embeddings([text])[0]
+
+
+def get_embeddings(texts: List[str], batch_size: int = None) -> List[list]:
+    """Get embeddings for many text chunks, reusing cached vectors for text seen before."""
+    if not texts:
+        return []
+    if not settings.embedding_cache_enabled:
+        return _compute_embeddings(texts, batch_size)
+    from backend.embedding_cache import cached_embeddings
+    return cached_embeddings(texts, _embedding_model_id(), lambda missing: _compute_embeddings(missing, batch_size))
+
+
+def _embedding_model_id() -> str:
+    """Identity of the configured embedding model, so cached vectors never mix models"""
+    backend = getattr(settings, 'embedding_backend', 'openai')
+    if backend == 'openai':
+        return f"openai:{settings.openai_embedding_model}"
+    return f"{backend}:{getattr(settings, 'sentence_transformers_model', 'all-MiniLM-L6-v2')}"
+
+
+def _compute_embeddings(texts: List[str], batch_size: int = None) -> List[list]:
+    """Embed text chunks with the configured backend, batching calls."""
+    batch_size = batch_size or settings.embedding_batch_size
     backend = getattr(settings, 'embedding_backend', 'openai')
     if backend == 'openai':
         try:
             import openai
-            response = openai.embeddings.create(
-                input=[text],
-                model=settings.openai_embedding_model,
-                api_key=settings.openai_api_key
-            )
-            embedding = response.data[0].embedding
-            return embedding
+            embeddings = []
+            for start in range(0, len(texts), OPENAI_EMBEDDING_BATCH_LIMIT):
+                response = openai.embeddings.create(
+                    input=texts[start:start + OPENAI_EMBEDDING_BATCH_LIMIT],
+                    model=settings.openai_embedding_model,
+                    api_key=settings.openai_api_key
+                )
+                embeddings.extend(item.embedding for item in response.data)
+            return embeddings
         except Exception as e:
             logger.error("OpenAI embedding error", error=str(e))
             raise
     elif backend == 'sentence-transformers':
         try:
             model_name = getattr(settings, 'sentence_transformers_model', 'all-MiniLM-L6-v2')
-            if not hasattr(get_embedding, '_model'):
-                get_embedding._model = get_sentence_transformers_model(model_name)
-            embedding = get_embedding._model.encode([text])[0].tolist()
-            return embedding
+            if not hasattr(_compute_embeddings, '_model'):
+                _compute_embeddings._model = get_sentence_transformers_model(model_name)
+            embeddings = _compute_embeddings._model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            return embeddings.tolist()
         except Exception as e:
             logger.error("Sentence-BERT embedding error", error=str(e))
             raise
@@ -56,6 +97,47 @@ def get_embedding(text: str) -> list:
         raise ValueError(f"Unknown embedding backend: {backend}")
 
 
+def _get_token_encoding():
+    """Load and cache the tiktoken encoding for the configured OpenAI model, or None if unavailable."""
+    if not hasattr(_get_token_encoding, '_encoding'):
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(settings.openai_model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning("tiktoken unavailable, estimating token counts from length", error=str(e))
+            encoding = None
+        _get_token_encoding._encoding = encoding
+    return _get_token_encoding._encoding
+
+
+def _uses_local_tokenizer() -> bool:
+    return getattr(settings, 'llm_backend', 'openai') == 'local-quantized' and hasattr(call_llm, '_llm')
+
+
+def get_tokenizer_id() -> str:
+    """Name of the tokenizer count_tokens currently uses, for keying cached counts."""
+    if _uses_local_tokenizer():
+        return 'llama'
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return f"tiktoken:{encoding.name}"
+    return 'estimate'
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text, using the local model's tokenizer when it is loaded and tiktoken otherwise."""
+    if _uses_local_tokenizer():
+        return len(call_llm._llm.tokenize(text.encode('utf-8'), add_bos=False))
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Rough estimate (about 4 chars per token for English)
+    return len(text) // 4
+
+
 def build_prompt(query: str, retrieved_chunks: List[Dict[str, Any]]) -> str:
     """Construct prompt for LLM using retrieved context"""
     context_blocks = []
@@ -68,7 +150,7 @@ def build_prompt(query: str, retrieved_chunks: List[Dict[str, Any]]) -> str:
 
     print("Context for prompt construction:", context_str)  # Debug print
     prompt = f"""
-You are a helpful code documentation assistant. Use the following code context to answer the user's question. If the answer is not in the context, say you don't know.
+{SYSTEM_PROMPT}
 
 Context:
 {context_str}
@@ -117,7 +199,17 @@ def call_llm(prompt: str) -> str:
             if not model_path or not os.path.exists(model_path):
                 raise ValueError(f"Local quantized model path not set or does not exist: {model_path}")
             if not hasattr(call_llm, '_llm'):
-                call_llm._llm = Llama(model_path=model_path)
+                n_threads = settings.local_llm_n_threads or os.cpu_count()
+                call_llm._llm = Llama(
+                    model_path=model_path,
+                    n_ctx=settings.local_llm_n_ctx,
+                    n_threads=n_threads,
+                    n_threads_batch=n_threads,
+                    n_batch=settings.local_llm_n_batch,
+                    use_mmap=True,
+                    use_mlock=False,
+                    logits_all=False
+                )
             output = call_llm._llm(prompt=prompt, max_tokens=512, temperature=0.2)
             answer = output["choices"][0]["text"] if "choices" in output else output.get("text", "")
             return answer.strip()
@@ -43,9 +43,26 @@ class StructuredLogger:
     
     def _log(self, level: int, message: str, context: Dict[str, Any]):
         """Internal method to log with context"""
-        context_str = " | ".join([f"{k}={v}" for k, v in context.items()])
-        full_message = f"{message} | {context_str}" if context_str else message
-        self.logger.log(level, full_message)
+        # Skip all formatting for records that would be filtered out anyway
+        if not self.logger.isEnabledFor(level):
+            return
+        if context:
+            # Context is only rendered when a handler formats the record
+            self.logger.log(level, "%s | %s", message, _LogContext(context))
+        else:
+            self.logger.log(level, message)
+
+
+class _LogContext:
+    """Renders structured log context as 'k=v | k=v' on demand"""
+    
+    __slots__ = ('context',)
+    
+    def __init__(self, context: Dict[str, Any]):
+        self.context = context
+    
+    def __str__(self) -> str:
+        return " | ".join(f"{k}={v}" for k, v in self.context.items())
 
 
 def get_logger(name: str) -> StructuredLogger:
@@ -8,10 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from backend.config import settings
 from backend.ingestor import CodebaseIngestor, add_chunks_to_chroma
 from backend.vector_store import get_vector_store
-from backend.llm_utils import build_prompt, call_llm
+from backend.llm_utils import build_prompt, call_llm, count_tokens, get_embedding, get_tokenizer_id
 from backend.logger import get_logger
 import os
 import shutil
+import threading
+from functools import lru_cache
 
 logger = get_logger(__name__)
 
@@ -30,6 +32,33 @@ UPLOAD_DIR = "./uploaded_code"
 
 vector_store = get_vector_store()
 
+# Shared across requests so /ask can expand context using the ingest-time indexes
+ingestor = CodebaseIngestor()
+ingest_lock = threading.Lock()
+
+
+@app.on_event("startup")
+def load_ingest_state():
+    """Restore chunks and cross-file indexes from the last ingest"""
+    ingestor.load_state()
+
+
+def _context_key(chunk):
+    """Identity of a context chunk for deduplication"""
+    return (chunk['metadata'].get('file_path'), chunk['metadata'].get('chunk_index'))
+
+
+@lru_cache(maxsize=10000)
+def _count_chunk_tokens(tokenizer_id: str, content: str) -> int:
+    """Token count of chunk content under the given tokenizer"""
+    return max(1, count_tokens(content))
+
+
+def _chunk_tokens(chunk) -> int:
+    """Token count of a context chunk, memoized per tokenizer so repeat questions skip tokenizing"""
+    # Kept out of chunk metadata, which the shared ingestor owns and persists
+    return _count_chunk_tokens(get_tokenizer_id(), chunk['content'])
+
 
 @app.post("/ingest")
 def ingest_codebase(directory: str = Form(...)):
@@ -37,11 +66,11 @@ def ingest_codebase(directory: str = Form(...)):
     Ingest a codebase from a local directory
     """
     try:
-        ingestor = CodebaseIngestor()
-        file_count = ingestor.ingest_directory(directory)
-        chunks = ingestor.get_chunks()
-        #vector_store = get_vector_store()
-        add_chunks_to_chroma(chunks, vector_store=vector_store)
+        with ingest_lock:
+            file_count = ingestor.ingest_directory(directory)
+            chunks = ingestor.get_last_ingested_chunks()
+            add_chunks_to_chroma(chunks, vector_store=vector_store)
+            ingestor.save_state()
         return {"status": "success", "files_processed": file_count, "chunks": len(chunks)}
     except Exception as e:
         logger.error("Ingestion failed", error=str(e))
@@ -62,10 +91,11 @@ def upload_codebase(file: UploadFile = File(...)):
         import zipfile
         with zipfile.ZipFile(file_path, 'r') as zip_ref:
             zip_ref.extractall(UPLOAD_DIR)
-        ingestor = CodebaseIngestor()
-        file_count = ingestor.ingest_directory(UPLOAD_DIR)
-        chunks = ingestor.get_chunks()
-        add_chunks_to_chroma(chunks, vector_store=vector_store) 
+        with ingest_lock:
+            file_count = ingestor.ingest_directory(UPLOAD_DIR)
+            chunks = ingestor.get_last_ingested_chunks()
+            add_chunks_to_chroma(chunks, vector_store=vector_store)
+            ingestor.save_state()
         return {"status": "success", "files_processed": file_count, "chunks": len(chunks)}
     except Exception as e:
         logger.error("Upload/ingest failed", error=str(e))
@@ -77,13 +107,12 @@ def ask_question(query: str = Form(...)):
     Answer a question about the ingested codebase, including cross-file context
     """
     try:
-        ingestor = CodebaseIngestor()  # Should be persistent/shared in production
         #print the metadata of the vector store / collection being used here
         print("Vector Store Metadata:", vector_store.metadata)
-        print("Chroma Collection Metadata at ask:", vector_store.get())
         n_results = settings.top_k_documents
         # ChromaDB returns a dict with keys: "ids", "documents", "metadatas", etc.
-        result = vector_store.query(query_texts=[query], n_results=n_results)
+        # Embed the query with the same backend used for the ingested chunks
+        result = vector_store.query(query_embeddings=[get_embedding(query)], n_results=n_results)
         expanded_context = []
         for i in range(len(result["ids"][0])):
             chunk = {
@@ -94,25 +123,24 @@ def ask_question(query: str = Form(...)):
         print("Retrieved context chunks:")
         for c in expanded_context:
             print(f"File: {c['metadata'].get('file_path')}, Chunk: {c['metadata'].get('chunk_index')}, Content: {c['content'][:200]}")
-        # Expand context with related chunks for cross-file reasoning
-        for chunk in expanded_context.copy():
-            related = ingestor.get_related_chunks(chunk)
-            expanded_context.extend(related)
-        # Remove duplicates
-        seen = set()
-        unique_context = []
-        for c in expanded_context:
-            key = (c['metadata'].get('file_path'), c['metadata'].get('chunk_index'))
-            if key not in seen:
-                unique_context.append(c)
-                seen.add(key)
-        # Limit the number of context tokens to avoid exceeding LLM context window
         max_tokens = 128  # or set to your LLM's context window limit
+        # Expand context one level with related chunks for cross-file reasoning, deduplicating as we go
+        unique_context = {_context_key(c): c for c in expanded_context}
+        collected_tokens = sum(_chunk_tokens(c) for c in unique_context.values())
+        for chunk in expanded_context:
+            # Anything added once the budget is used up would be cut below anyway
+            if collected_tokens >= max_tokens:
+                break
+            for related in ingestor.get_related_chunks(chunk):
+                key = _context_key(related)
+                if key not in unique_context:
+                    unique_context[key] = related
+                    collected_tokens += _chunk_tokens(related)
+        # Limit the number of context tokens to avoid exceeding LLM context window
         current_tokens = 0
         limited_context = []
-        for c in unique_context:
-            # Estimate tokens (roughly 4 chars per token for English)
-            chunk_tokens = max(1, len(c['content']) // 4)
+        for c in unique_context.values():
+            chunk_tokens = _chunk_tokens(c)
             if current_tokens + chunk_tokens > max_tokens:
                 break
             limited_context.append(c)
@@ -0,0 +1,138 @@
+"""
+On-disk cache for parsed source code
+Stores chunking results keyed by a hash of the source so unchanged files skip re-parsing
+"""
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+from backend.config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKING_STRATEGY
+from backend.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_CACHE_DIR = os.path.join(os.path.dirname(__file__), ".chunk_cache")
+PYTHON_VERSION = f"{sys.version_info.major}.{sys.version_info.minor}"
+# Bump whenever the layout of cached chunks changes so stale entries are ignored
+CHUNK_FORMAT_VERSION = "2"
+
+# Approximate entries per cache directory, so writes don't list the directory every time
+_entry_counts: Dict[str, int] = {}
+_entry_counts_lock = threading.Lock()
+
+
+def get_cache_key(*parts: str) -> str:
+    """Build a SHA-256 cache key from one or more string parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8', errors='surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_cached(cache_dir: str, key: str) -> Optional[Any]:
+    """Return the cached value for key, or None on a miss or unreadable entry."""
+    cache_path = os.path.join(cache_dir, f"{key}.pkl")
+    try:
+        with open(cache_path, 'rb') as f:
+            value = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Discarding unreadable cache entry", path=cache_path, error=str(e))
+        return None
+    # Refresh mtime so eviction drops the least recently used entries first
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return value
+
+
+def store_cached(cache_dir: str, key: str, value: Any, max_entries: int = 0):
+    """Atomically write value to the cache, evicting old entries beyond max_entries."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, f"{key}.pkl")
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning("Failed to write cache entry", cache_dir=cache_dir, error=str(e))
+        return
+    if max_entries > 0:
+        _note_write(cache_dir, max_entries)
+
+
+def _note_write(cache_dir: str, max_entries: int):
+    """Count a write and evict only once the cache has grown past max_entries."""
+    with _entry_counts_lock:
+        count = _entry_counts.get(cache_dir)
+        # Scan once per process; after that a counter stands in for listing the directory
+        count = _count_entries(cache_dir) if count is None else count + 1
+        _entry_counts[cache_dir] = count
+        if count <= max_entries:
+            return
+        _entry_counts[cache_dir] = _evict(cache_dir, eviction_target(max_entries))
+
+
+def eviction_target(max_entries: int) -> int:
+    """Entries to keep when a cache overflows: a little below the limit, so the next eviction is many writes away"""
+    return max_entries - max_entries // 10
+
+
+def _count_entries(cache_dir: str) -> int:
+    try:
+        return sum(1 for e in os.scandir(cache_dir) if e.name.endswith('.pkl'))
+    except OSError:
+        return 0
+
+
+def _evict(cache_dir: str, max_entries: int) -> int:
+    """Remove the least recently used entries beyond max_entries; returns the entries left."""
+    try:
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if not entry.name.endswith('.pkl'):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                # Removed by another worker between the scan and the stat
+                continue
+        if len(entries) <= max_entries:
+            return len(entries)
+        entries.sort()
+        for _, path in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return max_entries
+    except Exception as e:
+        logger.warning("Failed to evict cache entries", cache_dir=cache_dir, error=str(e))
+        return 0
+
+
+def get_file_chunk_key(digest: str) -> str:
+    """Cache key for the chunks of a file, given the SHA-256 of its bytes and the chunking settings."""
+    return get_cache_key(PYTHON_VERSION, CHUNK_FORMAT_VERSION, CHUNKING_STRATEGY,
+                         str(CHUNK_SIZE), str(CHUNK_OVERLAP), digest)
+
+
+def load_file_chunks(path: str, digest: str) -> Optional[List[dict]]:
+    """Load cached chunks for a file digest, re-stamped with the given file path."""
+    chunks = load_cached(CHUNK_CACHE_DIR, get_file_chunk_key(digest))
+    if chunks is None:
+        return None
+    for chunk in chunks:
+        chunk['metadata']['file_path'] = path
+    return chunks
+
+
+def store_file_chunks(digest: str, chunks: List[dict], max_entries: int = 0):
+    """Persist the chunks of a file under its digest."""
+    store_cached(CHUNK_CACHE_DIR, get_file_chunk_key(digest), chunks, max_entries)
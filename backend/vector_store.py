@@ -2,15 +2,280 @@
 Vector store and retrieval module
 Handles embeddings and semantic search
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from backend.logger import get_logger
 from backend.config import settings
-from backend.llm_utils import get_embedding
+from backend.llm_utils import get_embedding, get_embeddings
+from backend.embedding_cache import SQLITE_MAX_PARAMS
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+import hashlib
+import json
 import os
-from chromadb import Client
+import queue
+import sqlite3
+import threading
+import time
+
+try:
+    import chromadb
+    import chromadb.config
+except ImportError:
+    chromadb = None
 
 logger = get_logger(__name__)
 
+# Embedded batches buffered ahead of the writer; bounds memory when writes fall behind
+RING_SIZE = 4
+
+
+def _length_sorted_batches(texts: List[str], batch_size: int) -> Iterator[List[int]]:
+    """
+    Yield batches of indices into texts, ordered by text length
+    Similar-length texts share a batch, so the embedding model pads each batch only to
+    the length of its own longest text instead of the longest text overall.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        yield order[start:start + batch_size]
+
+
+def _hnsw_metadata(space: Optional[str] = None) -> Dict[str, Any]:
+    """Collection metadata carrying the configured HNSW build and search parameters"""
+    metadata = {
+        "hnsw:M": settings.hnsw_m,
+        "hnsw:construction_ef": settings.hnsw_construction_ef,
+        "hnsw:search_ef": settings.hnsw_search_ef,
+        "hnsw:num_threads": settings.hnsw_num_threads or os.cpu_count() or 1,
+    }
+    if space:
+        metadata["hnsw:space"] = space
+    return metadata
+
+
+def _apply_hnsw_search_settings(collection):
+    """
+    Bring an existing collection's search-time HNSW parameters in line with settings
+    get_or_create_collection keeps the configuration a persisted collection was built with,
+    so only new collections see _hnsw_metadata. M and construction_ef are baked into the
+    graph and only change once the collection is rebuilt (delete_all, then re-ingest).
+    """
+    hnsw = (getattr(collection, 'configuration', None) or {}).get('hnsw') or {}
+    if not hnsw:
+        return
+    for key, configured in (('max_neighbors', settings.hnsw_m), ('ef_construction', settings.hnsw_construction_ef)):
+        if key in hnsw and hnsw[key] != configured:
+            logger.warning("Collection was built with different HNSW settings; rebuild it to apply them",
+                           collection=collection.name, parameter=key, stored=hnsw[key], configured=configured)
+    if hnsw.get('ef_search') != settings.hnsw_search_ef:
+        try:
+            collection.modify(configuration={"hnsw": {
+                "ef_search": settings.hnsw_search_ef,
+                "num_threads": settings.hnsw_num_threads or os.cpu_count() or 1,
+            }})
+        except Exception as e:
+            logger.warning("Failed to update HNSW search settings", collection=collection.name, error=str(e))
+
+
+def _chunk_id(chunk: Dict[str, Any]) -> str:
+    """Content-derived id, so re-adding an unchanged chunk overwrites it instead of duplicating it"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(chunk.get('metadata', {}).get('file_path', '')).encode('utf-8', errors='surrogatepass'))
+    digest.update(b'\0')
+    digest.update(chunk['content'].encode('utf-8', errors='surrogatepass'))
+    return digest.hexdigest()
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    """L2-normalize each row so cosine similarity reduces to an inner product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12
+    return vectors
+
+
+@lru_cache(maxsize=256)
+def _embed_query(query: str) -> np.ndarray:
+    """Normalized query embedding, memoized for callers that repeat the same question"""
+    embedding = _normalize_rows(get_embedding(query))
+    # Shared between callers through the cache, so guard it against in-place edits
+    embedding.setflags(write=False)
+    return embedding
+
+
+def _distances_to_similarities(distances) -> np.ndarray:
+    """Convert cosine distances to similarity scores in one vectorized step"""
+    # Copy once into float32, then subtract in place rather than allocating a second array
+    sims = np.array(distances, dtype=np.float32)
+    np.subtract(1.0, sims, out=sims)
+    return sims
+
+
+def _columns(contents: List[str], metadatas: List[Dict[str, Any]], similarity_scores: np.ndarray) -> Dict[str, Any]:
+    """
+    Query results as parallel columns rather than one dict per document
+    The query cache hands the same columns to every caller, so the columns are tuples and a
+    read-only array; the metadata dicts inside are shared too and must not be edited.
+    """
+    similarity_scores.setflags(write=False)
+    return {'contents': tuple(contents), 'metadatas': tuple(metadatas), 'similarity_scores': similarity_scores}
+
+
+def _empty_columns() -> Dict[str, Any]:
+    return _columns([], [], np.empty(0, dtype=np.float32))
+
+
+def _rows_from_columns(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Adapt columnar query results to the list-of-dicts shape returned by query()"""
+    # Each row gets its own metadata dict, so callers may edit rows without touching cached results
+    return [
+        {'content': doc, 'metadata': dict(metadata) if metadata is not None else None, 'similarity_score': sim}
+        for doc, metadata, sim in zip(columns['contents'], columns['metadatas'],
+                                      columns['similarity_scores'].tolist())
+    ]
+
+
+class _QueryCache:
+    """
+    Two-level cache of columnar query results
+    Exact (query, top_k) matches are checked first, then prior queries whose embedding
+    is within the cosine similarity threshold of the new one.
+    """
+    
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.clear()
+    
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._exact: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+            self._embeddings: Optional[np.ndarray] = None
+            self._top_ks: List[int] = []
+            self._results: List[Dict[str, Any]] = []
+    
+    def get_exact(self, query: str, top_k: int) -> Optional[Dict[str, Any]]:
+        """Results for an identical earlier query, or None"""
+        with self._lock:
+            results = self._exact.get((query, top_k))
+            if results is not None:
+                self._exact.move_to_end((query, top_k))
+            return results
+    
+    def get_similar(self, embedding: np.ndarray, top_k: int) -> Optional[Dict[str, Any]]:
+        """Results for the most similar earlier query above the threshold, or None"""
+        with self._lock:
+            if self._embeddings is None:
+                return None
+            sims = self._embeddings @ embedding
+            sims[np.asarray(self._top_ks) != top_k] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                return self._results[best]
+            return None
+    
+    def put(self, query: str, embedding: np.ndarray, top_k: int, results: Dict[str, Any]):
+        """Cache results under both the query string and its embedding"""
+        with self._lock:
+            self._exact[(query, top_k)] = results
+            if len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+            # Oldest semantic entries are dropped first once the cache is full
+            if len(self._results) >= self.max_entries:
+                drop = len(self._results) - self.max_entries + 1
+                self._embeddings = self._embeddings[drop:]
+                self._top_ks = self._top_ks[drop:]
+                self._results = self._results[drop:]
+            row = embedding[np.newaxis, :]
+            self._embeddings = row if self._embeddings is None else np.vstack([self._embeddings, row])
+            self._top_ks.append(top_k)
+            self._results.append(results)
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent queries into a single collection query
+    Queries arriving within window_ms of the first share one embedding batch and HNSW search call.
+    """
+    
+    def __init__(self, query_fn: Callable[[List[List[float]], int], Dict[str, Any]],
+                 window_ms: float, max_batch: int = 32):
+        self._query_fn = query_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def submit(self, embedding: List[float], top_k: int) -> Dict[str, Any]:
+        """Query one embedding, returning a result shaped like collection.query for a single query"""
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                # Each worker gets its own queue, so close() never strands requests on a stopped worker
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="query-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put((embedding, top_k, future))
+        return future.result()
+    
+    def close(self):
+        """Stop the worker thread once queued queries are answered; a later submit starts a new one"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+    
+    def _run(self, requests: queue.Queue):
+        while True:
+            item = requests.get()
+            if item is None:
+                return
+            pending = [item]
+            stopping = False
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+            self._dispatch(pending)
+            if stopping:
+                return
+    
+    def _dispatch(self, pending: List[Tuple[List[float], int, Future]]):
+        # Any failure is handed to every waiting caller; the worker itself must keep running
+        try:
+            # One call at the largest top_k, then each caller keeps its own top_k
+            n_results = max(top_k for _, top_k, _ in pending)
+            results = self._query_fn([embedding for embedding, _, _ in pending], n_results)
+            rows = [
+                {
+                    key: [results[key][row][:top_k]] if results.get(key) else None
+                    for key in ('ids', 'documents', 'metadatas', 'distances')
+                }
+                for row, (_, top_k, _) in enumerate(pending)
+            ]
+        except Exception as e:
+            for _, _, future in pending:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(pending, rows):
+            future.set_result(result)
+
 
 class VectorStore:
     """
@@ -26,6 +291,13 @@ class VectorStore:
         """Retrieve relevant documents for a query"""
         raise NotImplementedError
     
+    def query_columnar(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+        """
+        Retrieve relevant documents as {'contents', 'metadatas', 'similarity_scores'} columns
+        Columns may be shared with the query cache, so treat them as read-only; query() returns copies.
+        """
+        raise NotImplementedError
+    
     def delete_all(self):
         """Clear the vector store"""
         raise NotImplementedError
@@ -38,10 +310,7 @@ class ChromaVectorStore(VectorStore):
     """
     
     def __init__(self):
-        try:
-            import chromadb
-            from chromadb.config import Settings as ChromaSettings
-        except ImportError:
+        if chromadb is None:
             raise ImportError(
                 "chromadb not installed. Install with: pip install chromadb"
             )
@@ -49,89 +318,424 @@ class ChromaVectorStore(VectorStore):
         self.chroma = chromadb
         
         # Initialize Chroma with persistent storage
-        chroma_settings = ChromaSettings(
+        chroma_settings = chromadb.config.Settings(
             chroma_db_impl="duckdb+parquet",
             persist_directory="./chroma_data",
             anonymized_telemetry=False,
         )
         
-        self.client = chromadb.Client(chroma_settings)
+        if settings.chroma_host:
+            # Server mode: writes are network round trips, so several can be in flight at once
+            self.client = chromadb.HttpClient(host=settings.chroma_host, port=settings.chroma_port)
+            self.write_workers = max(1, settings.chroma_write_concurrency)
+        else:
+            self.client = chromadb.Client(chroma_settings)
+            self.write_workers = 1
         self.collection = None
+        # Documents in the collection, tracked so queries against an empty store skip Chroma
+        self._count = 0
+        self.query_cache = _QueryCache(settings.query_cache_size, settings.semantic_cache_threshold) \
+            if settings.query_cache_enabled and settings.query_cache_size > 0 else None
+        self.query_batcher = QueryBatcher(self._query_collection, settings.query_batch_window_ms) \
+            if settings.query_batch_window_ms > 0 else None
         logger.info("Initialized ChromaVectorStore")
     
+    def close(self):
+        """Stop the query batcher's worker thread"""
+        if self.query_batcher is not None:
+            self.query_batcher.close()
+    
+    def _get_collection(self):
+        """Create or get the collection once and reuse it for later calls"""
+        if self.collection is None:
+            self.collection = self.client.get_or_create_collection(
+                name="code_docs",
+                # Vectors are unit length, so inner product ranks like cosine without the norm terms
+                metadata=_hnsw_metadata("ip")
+            )
+            _apply_hnsw_search_settings(self.collection)
+            self._count = self.collection.count()
+        return self.collection
+    
+    def _query_collection(self, query_embeddings: List[List[float]], n_results: int) -> Dict[str, Any]:
+        """Run one collection query for a batch of embeddings"""
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results)
+    
+    def _existing_metadatas(self, collection, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored metadata for the ids from the given list that are already in the collection"""
+        existing = {}
+        batch_size = settings.chroma_batch_size
+        for start in range(0, len(ids), batch_size):
+            found = collection.get(ids=ids[start:start + batch_size], include=['metadatas'])
+            existing.update(zip(found['ids'], found['metadatas'] or [None] * len(found['ids'])))
+        return existing
+    
+    def _stored_ids_for_files(self, collection, file_paths: List[str]) -> List[str]:
+        """Ids of every chunk currently stored for the given files"""
+        stored = []
+        batch_size = settings.chroma_batch_size
+        for start in range(0, len(file_paths), batch_size):
+            batch = file_paths[start:start + batch_size]
+            where = {'file_path': batch[0]} if len(batch) == 1 else {'file_path': {'$in': batch}}
+            stored.extend(collection.get(where=where, include=[])['ids'])
+        return stored
+    
     def add_documents(self, chunks: List[Dict[str, Any]]) -> int:
-        """Add chunks to Chroma"""
+        """
+        Add chunks to Chroma
+        chunks must hold every chunk of each file they come from: stored chunks of those files
+        that are not among them are treated as outdated and removed.
+        """
         if not chunks:
             logger.warning("No chunks to add")
             return 0
         
-        # Create or get collection
-        self.collection = self.client.get_or_create_collection(
-            name="code_docs",
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        # Prepare documents for insertion
-        ids = []
-        documents = []
-        metadatas = []
-        embeddings = []
+        collection = self._get_collection()
+        if self.query_cache is not None:
+            self.query_cache.clear()
         
+        # Prepare documents for insertion, dropping repeats of the same chunk
+        first_index = {}
         for i, chunk in enumerate(chunks):
-            ids.append(f"chunk_{i}")
-            documents.append(chunk['content'])
-            metadatas.append(chunk.get('metadata', {}))
-            # Compute embedding using the configured backend
-            embeddings.append(get_embedding(chunk['content']))
-        
-        # Add to collection
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas,
-            embeddings=embeddings
-        )
+            first_index.setdefault(_chunk_id(chunk), i)
+        # Chunks from earlier versions of these files are no longer in the new id set
+        file_paths = list({
+            chunk['metadata']['file_path'] for chunk in chunks
+            if chunk.get('metadata', {}).get('file_path') is not None
+        })
+        stale = [chunk_id for chunk_id in self._stored_ids_for_files(collection, file_paths)
+                 if chunk_id not in first_index]
+        if stale:
+            collection.delete(ids=stale)
+            self._count = max(0, self._count - len(stale))
+        # Ids are content hashes, so anything already stored needs no embedding; only its
+        # metadata (e.g. a chunk_index that moved) may need refreshing
+        existing = self._existing_metadatas(collection, list(first_index))
+        moved = [chunk_id for chunk_id, metadata in existing.items()
+                 if metadata != chunks[first_index[chunk_id]].get('metadata', {})]
+        if moved:
+            collection.update(ids=moved, metadatas=[chunks[first_index[chunk_id]].get('metadata', {})
+                                                    for chunk_id in moved])
+        new_index = {chunk_id: i for chunk_id, i in first_index.items() if chunk_id not in existing}
+        if not new_index:
+            logger.info("All chunks already in vector store", skipped=len(first_index),
+                        removed=len(stale), updated=len(moved))
+            return 0
+        ids = list(new_index)
+        documents = [chunks[i]['content'] for i in new_index.values()]
+        metadatas = [chunks[i].get('metadata', {}) for i in new_index.values()]
+        # Embed length-sorted batches on a worker thread while this thread writes the
+        # previous ones, so the embedding model and Chroma are busy at the same time
+        batches: queue.Queue = queue.Queue(maxsize=RING_SIZE)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def embed_batches():
+            try:
+                for batch in _length_sorted_batches(documents, settings.embedding_batch_size):
+                    if stop.is_set():
+                        return
+                    batch_documents = [documents[i] for i in batch]
+                    put((batch, batch_documents, _normalize_rows(get_embeddings(batch_documents))))
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+
+        # Embedded batches are small; group them into writes of chroma_batch_size so each
+        # upsert stays bounded in memory without paying per-call overhead every 64 chunks
+        pending: List[int] = []
+        pending_documents: List[str] = []
+        # Kept as float32 arrays: Chroma validates embeddings into float32 arrays anyway,
+        # so this skips building and re-parsing a Python float per dimension
+        pending_embeddings: List[np.ndarray] = []
+        in_flight: deque = deque()
+
+        def flush(writer):
+            nonlocal pending, pending_documents, pending_embeddings
+            # Wait for the oldest write once write_workers are busy, bounding memory held by queued writes
+            if len(in_flight) >= self.write_workers:
+                in_flight.popleft().result()
+            in_flight.append(writer.submit(
+                collection.upsert,
+                ids=[ids[i] for i in pending],
+                documents=pending_documents,
+                metadatas=[metadatas[i] for i in pending],
+                embeddings=np.concatenate(pending_embeddings)
+            ))
+            pending, pending_documents, pending_embeddings = [], [], []
+
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                ThreadPoolExecutor(max_workers=self.write_workers) as writer:
+            executor.submit(embed_batches)
+            try:
+                while True:
+                    item = batches.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    batch, batch_documents, batch_embeddings = item
+                    pending.extend(batch)
+                    pending_documents.extend(batch_documents)
+                    pending_embeddings.append(batch_embeddings)
+                    if len(pending) >= settings.chroma_batch_size:
+                        flush(writer)
+                if pending:
+                    flush(writer)
+                while in_flight:
+                    in_flight.popleft().result()
+            finally:
+                # Unblock the producer if the writer failed part way through
+                stop.set()
         
-        logger.info(f"Added {len(chunks)} chunks to vector store")
-        return len(chunks)
+        # Ids that already existed were skipped above, so every written id is new
+        self._count += len(ids)
+        logger.info(f"Added {len(ids)} chunks to vector store", skipped=len(existing),
+                    removed=len(stale), updated=len(moved))
+        return len(ids)
     
     def query(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Query the vector store"""
+        return _rows_from_columns(self.query_columnar(query, top_k))
+    
+    def query_columnar(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+        """Query the vector store, returning results as parallel columns"""
         if not self.collection:
             logger.warning("Collection not initialized, returning empty results")
-            return []
+            return _empty_columns()
+        if top_k <= 0 or self._count == 0:
+            return _empty_columns()
         
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k
-        )
+        cache = self.query_cache
+        if cache is not None:
+            cached = cache.get_exact(query, top_k)
+            if cached is not None:
+                logger.debug("Exact query cache hit", query=query)
+                return cached
+        
+        # Normalized like the stored vectors, so the inner product is the cosine similarity
+        query_embedding = _embed_query(query)
+        if cache is not None:
+            cached = cache.get_similar(query_embedding, top_k)
+            if cached is not None:
+                logger.debug("Semantic query cache hit", query=query)
+                return cached
         
-        # Format results
-        retrieved_docs = []
+        if self.query_batcher is not None:
+            results = self.query_batcher.submit(query_embedding.tolist(), top_k)
+        else:
+            results = self.collection.query(
+                query_embeddings=[query_embedding.tolist()],
+                n_results=top_k
+            )
+        
+        # Chroma already returns columns, so only the distances need converting
+        columns = _empty_columns()
         if results and results['documents'] and len(results['documents']) > 0:
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                distance = results['distances'][0][i] if results['distances'] else 0
-                
-                retrieved_docs.append({
-                    'content': doc,
-                    'metadata': metadata,
-                    'similarity_score': 1 - distance  # Convert distance to similarity
-                })
-        
-        logger.debug(f"Retrieved {len(retrieved_docs)} documents", query=query)
-        return retrieved_docs
+            docs = results['documents'][0]
+            metas = results['metadatas'][0] if results['metadatas'] else [{}] * len(docs)
+            if results['distances']:
+                sims = _distances_to_similarities(results['distances'][0])
+            else:
+                sims = np.ones(len(docs), dtype=np.float32)
+            columns = _columns(docs, metas, sims)
+        
+        if cache is not None:
+            cache.put(query, query_embedding, top_k, columns)
+        logger.debug(f"Retrieved {len(columns['contents'])} documents", query=query)
+        return columns
     
     def delete_all(self):
         """Clear all collections"""
         try:
             self.client.delete_collection(name="code_docs")
             self.collection = None
+            self._count = 0
+            self.close()
+            if self.query_cache is not None:
+                self.query_cache.clear()
             logger.info("Cleared vector store")
         except Exception as e:
             logger.warning(f"Error clearing vector store: {e}")
 
 
+class UsearchVectorStore(VectorStore):
+    """
+    usearch-based vector store with quantized vectors
+    Stores embeddings as f16 or i8 to cut memory and bandwidth per HNSW node visit
+    """
+    
+    def __init__(self, persist_directory: str = "./usearch_data"):
+        try:
+            from usearch.index import Index
+        except ImportError:
+            raise ImportError(
+                "usearch not installed. Install with: pip install usearch"
+            )
+        
+        self._index_cls = Index
+        self.dtype = settings.usearch_dtype
+        os.makedirs(persist_directory, exist_ok=True)
+        self.index_path = os.path.join(persist_directory, "index.usearch")
+        self._lock = threading.Lock()
+        
+        # Documents and metadata live in a sqlite sidecar keyed by the index's integer keys
+        self.db = sqlite3.connect(os.path.join(persist_directory, "chunks.db"), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks "
+            "(key INTEGER PRIMARY KEY, content TEXT, metadata TEXT, chunk_id TEXT, file_path TEXT)"
+        )
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(chunks)")]
+        for column in ('chunk_id', 'file_path'):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE chunks ADD COLUMN {column} TEXT")
+        self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS chunks_chunk_id ON chunks (chunk_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_file_path ON chunks (file_path)")
+        self.db.commit()
+        self._next_key = (self.db.execute("SELECT MAX(key) FROM chunks").fetchone()[0] or -1) + 1
+        
+        self.index = None
+        if os.path.exists(self.index_path):
+            self.index = Index.restore(self.index_path)
+        logger.info(f"Initialized UsearchVectorStore with dtype: {self.dtype}")
+    
+    def _get_index(self, ndim: int):
+        """Create the index on first use, once the embedding dimension is known"""
+        if self.index is None:
+            # usearch quantizes each vector to dtype on insert. Vectors are unit length so 'ip'
+            # ranks like cosine, except for i8 whose integer dot products are only scaled by 'cos'
+            self.index = self._index_cls(
+                ndim=ndim,
+                metric='cos' if self.dtype == 'i8' else 'ip',
+                dtype=self.dtype,
+                connectivity=settings.usearch_connectivity,
+                expansion_add=settings.usearch_expansion_add,
+                expansion_search=settings.hnsw_search_ef,
+            )
+        return self.index
+    
+    def _rows_where_in(self, column: str, values: List[str]) -> List[Tuple[int, str, str]]:
+        """(key, chunk_id, metadata) of sidecar rows whose column is one of values"""
+        rows = []
+        for start in range(0, len(values), SQLITE_MAX_PARAMS):
+            batch = values[start:start + SQLITE_MAX_PARAMS]
+            rows.extend(self.db.execute(
+                f"SELECT key, chunk_id, metadata FROM chunks WHERE {column} IN ({','.join('?' * len(batch))})",
+                batch
+            ))
+        return rows
+    
+    def add_documents(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Add chunks to the usearch index
+        As with ChromaVectorStore, chunks must hold every chunk of each file they come from.
+        """
+        if not chunks:
+            logger.warning("No chunks to add")
+            return 0
+        
+        # Content-hash ids, as in ChromaVectorStore, so re-adding a chunk never duplicates it
+        first_index = {}
+        for i, chunk in enumerate(chunks):
+            first_index.setdefault(_chunk_id(chunk), i)
+        file_paths = list({
+            chunk['metadata']['file_path'] for chunk in chunks
+            if chunk.get('metadata', {}).get('file_path') is not None
+        })
+        with self._lock:
+            # Drop chunks from earlier versions of these files
+            stale = [key for key, chunk_id, _ in self._rows_where_in('file_path', file_paths)
+                     if chunk_id not in first_index]
+            if stale:
+                if self.index is not None:
+                    self.index.remove(np.asarray(stale, dtype=np.uint64))
+                self.db.executemany("DELETE FROM chunks WHERE key = ?", [(key,) for key in stale])
+            # Chunks already stored need no embedding, only a metadata refresh if it moved
+            existing = set()
+            moved = []
+            for key, chunk_id, metadata in self._rows_where_in('chunk_id', list(first_index)):
+                existing.add(chunk_id)
+                new_metadata = json.dumps(chunks[first_index[chunk_id]].get('metadata', {}))
+                if metadata != new_metadata:
+                    moved.append((new_metadata, key))
+            if moved:
+                self.db.executemany("UPDATE chunks SET metadata = ? WHERE key = ?", moved)
+            new_index = [(chunk_id, i) for chunk_id, i in first_index.items() if chunk_id not in existing]
+            documents = [chunks[i]['content'] for _, i in new_index]
+            for batch in _length_sorted_batches(documents, settings.embedding_batch_size):
+                vectors = _normalize_rows(get_embeddings([documents[j] for j in batch]))
+                keys = np.arange(self._next_key, self._next_key + len(batch), dtype=np.uint64)
+                self._get_index(vectors.shape[1]).add(keys, vectors)
+                rows = []
+                for key, j in zip(keys.tolist(), batch):
+                    chunk_id, i = new_index[j]
+                    metadata = chunks[i].get('metadata', {})
+                    rows.append((key, documents[j], json.dumps(metadata), chunk_id, metadata.get('file_path')))
+                self.db.executemany(
+                    "INSERT INTO chunks (key, content, metadata, chunk_id, file_path) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._next_key += len(batch)
+            self.db.commit()
+            if self.index is not None:
+                self.index.save(self.index_path)
+        
+        logger.info(f"Added {len(new_index)} chunks to vector store", skipped=len(existing),
+                    removed=len(stale), updated=len(moved))
+        return len(new_index)
+    
+    def query(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Query the usearch index"""
+        return _rows_from_columns(self.query_columnar(query, top_k))
+    
+    def query_columnar(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+        """Query the usearch index, returning results as parallel columns"""
+        if self.index is None or len(self.index) == 0:
+            logger.warning("Index empty, returning empty results")
+            return _empty_columns()
+        if top_k <= 0:
+            return _empty_columns()
+        
+        query_embedding = _embed_query(query)
+        matches = self.index.search(query_embedding, top_k)
+        keys = matches.keys.tolist()
+        sims = _distances_to_similarities(matches.distances)
+        placeholders = ",".join("?" * len(keys))
+        rows = {
+            key: (content, metadata)
+            for key, content, metadata in self.db.execute(
+                f"SELECT key, content, metadata FROM chunks WHERE key IN ({placeholders})", keys
+            )
+        }
+        found = [i for i, key in enumerate(keys) if key in rows]
+        columns = _columns(
+            [rows[keys[i]][0] for i in found],
+            [json.loads(rows[keys[i]][1]) for i in found],
+            sims[found]
+        )
+        logger.debug(f"Retrieved {len(found)} documents", query=query)
+        return columns
+    
+    def delete_all(self):
+        """Clear the index and its sidecar"""
+        with self._lock:
+            self.index = None
+            self.db.execute("DELETE FROM chunks")
+            self.db.commit()
+            self._next_key = 0
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        logger.info("Cleared vector store")
+
+
 class PineconeVectorStore(VectorStore):
     """
     Pinecone-based vector store for production
@@ -157,11 +761,6 @@ class PineconeVectorStore(VectorStore):
     
     def add_documents(self, chunks: List[Dict[str, Any]]) -> int:
         """Add chunks to Pinecone"""
-        try:
-            from langchain.embeddings.openai import OpenAIEmbeddings
-        except ImportError:
-            raise ImportError("langchain not installed")
-        
         if not chunks:
             return 0
         
@@ -172,10 +771,14 @@ class PineconeVectorStore(VectorStore):
     
     def query(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Query Pinecone"""
+        return _rows_from_columns(self.query_columnar(query, top_k))
+
+    def query_columnar(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+        """Query Pinecone, returning results as parallel columns"""
         # Placeholder for Pinecone query
         logger.info(f"Would query Pinecone: {query}")
-        return []
-    
+        return _empty_columns()
+
     def delete_all(self):
         """Clear index"""
         logger.info("Would clear Pinecone index")
@@ -190,15 +793,32 @@ def get_vector_store_2() -> VectorStore:
     
     if vector_store_type == 'pinecone':
         return PineconeVectorStore()
+    elif vector_store_type == 'usearch':
+        return UsearchVectorStore()
     else:
         return ChromaVectorStore()
 
+_client = None
+_collection = None
+_collection_lock = threading.Lock()
+
+
 def get_vector_store():
     """Factory to get or create a ChromaDB collection for vector storage."""
-    client = Client()
-    # Use get_or_create_collection to avoid errors if collection doesn't exist
-    collection = client.get_or_create_collection(name="chroma_docs")
-    return collection
+    global _client, _collection
+    if chromadb is None:
+        raise ImportError(
+            "chromadb not installed. Install with: pip install chromadb"
+        )
+    # Creating the client re-opens persistence, so build it once and share the collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                _client = chromadb.Client()
+                # Use get_or_create_collection to avoid errors if collection doesn't exist
+                _collection = _client.get_or_create_collection(name="chroma_docs", metadata=_hnsw_metadata())
+                _apply_hnsw_search_settings(_collection)
+    return _collection
 
 # Example usage for adding and retrieving documents:
 def add_document_to_chroma(doc_id: str, content: str):
@@ -0,0 +1,35 @@
+import sys
+import os
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+import embedding_cache
+from embedding_cache import EmbeddingCache, cached_embeddings
+
+def test_cached_embeddings_only_computes_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    calls = []
+    def compute(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+    assert cached_embeddings(['a', 'bb'], 'model', compute, cache) == [[1.0, 0.5], [2.0, 0.5]]
+    assert cached_embeddings(['bb', 'ccc'], 'model', compute, cache) == [[2.0, 0.5], [3.0, 0.5]]
+    assert calls == [['a', 'bb'], ['ccc']]
+    # A different model never reuses another model's vectors
+    cached_embeddings(['a'], 'other-model', compute, cache)
+    assert calls[-1] == ['a']
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_entries=3)
+    compute = lambda texts: [[float(len(t))] for t in texts]
+    cached_embeddings(['a', 'bb', 'ccc'], 'model', compute, cache)
+    cached_embeddings(['a'], 'model', compute, cache)
+    cached_embeddings(['dddd'], 'model', compute, cache)
+    assert cache.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] <= 3
+    calls = []
+    cached_embeddings(['a', 'bb'], 'model', lambda texts: calls.append(texts) or compute(texts), cache)
+    assert calls == [['bb']]
+
+def test_default_path_resolved_at_call_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, 'EMBEDDING_CACHE_PATH', str(tmp_path / "default.sqlite"))
+    assert EmbeddingCache().path == str(tmp_path / "default.sqlite")
+    assert (tmp_path / "default.sqlite").exists()
@@ -2,7 +2,16 @@ import sys
 import os
 import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+import ingestor
 from ingestor import CodebaseIngestor
+from backend import source_cache
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path_factory, monkeypatch):
+    # Keep the chunk cache out of the source tree
+    cache_root = tmp_path_factory.mktemp("caches")
+    monkeypatch.setattr(source_cache, 'CHUNK_CACHE_DIR', str(cache_root / "chunks"))
+    return cache_root
 
 def test_ingest_directory(tmp_path):
     # Create a sample Python file
@@ -18,3 +27,80 @@ def foo():
     chunks = ingestor.get_chunks()
     assert len(chunks) >= 1
     assert 'foo' in chunks[0]['content']
+
+def _crash_worker(*args):
+    os._exit(1)
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Take the process pool path even on a single-CPU runner
+    monkeypatch.setattr(CodebaseIngestor, 'PARALLEL_MIN_FILES', 1)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+
+def test_ingest_directory_parallel(tmp_path, parallel):
+    for i in range(4):
+        (tmp_path / f"mod{i}.py").write_text(f"def func{i}():\n    return {i}\n")
+    (tmp_path / "notes.md").write_text("# Notes\nsome text\n")
+    ingestor = CodebaseIngestor()
+    count = ingestor.ingest_directory(str(tmp_path))
+    assert count == 5
+    assert sorted(ingestor.function_index) == ['func0', 'func1', 'func2', 'func3']
+
+def test_ingest_directory_survives_broken_pool(tmp_path, parallel, monkeypatch):
+    # Forked workers inherit the patched initializer and die before chunking anything
+    monkeypatch.setattr(CodebaseIngestor, 'PROCESS_START_METHOD', 'fork')
+    monkeypatch.setattr(ingestor, '_init_worker', _crash_worker)
+    for i in range(4):
+        (tmp_path / f"mod{i}.py").write_text(f"def func{i}():\n    return {i}\n")
+    codebase = CodebaseIngestor()
+    assert codebase.ingest_directory(str(tmp_path)) == 4
+    assert sorted(codebase.function_index) == ['func0', 'func1', 'func2', 'func3']
+
+def test_get_related_chunks(tmp_path):
+    (tmp_path / "helpers.py").write_text('"""Helper utilities"""\n\ndef helper():\n    return 1\n')
+    (tmp_path / "app.py").write_text("import helpers\n\ndef run():\n    return helper()\n")
+    ingestor = CodebaseIngestor()
+    ingestor.ingest_directory(str(tmp_path))
+    run_chunk = next(c for c in ingestor.get_chunks() if c['metadata'].get('name') == 'run')
+    related = ingestor.get_related_chunks(run_chunk)
+    contents = [c['content'] for c in related]
+    assert any('def helper' in c for c in contents)
+    assert any('Helper utilities' in c for c in contents)
+
+def test_ingest_directory_skips_ignored_dirs(tmp_path):
+    (tmp_path / "main.py").write_text("def main():\n    pass\n")
+    for ignored in ("node_modules", ".git", ".hidden"):
+        (tmp_path / ignored).mkdir()
+        (tmp_path / ignored / "vendored.js").write_text("function vendored() {}\n")
+    ingestor = CodebaseIngestor()
+    assert ingestor.ingest_directory(str(tmp_path)) == 1
+
+def test_reingest_replaces_and_state_roundtrip(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "mod.py").write_text("def foo():\n    return 1\n")
+    ingestor = CodebaseIngestor()
+    ingestor.ingest_directory(str(src))
+    (src / "mod.py").write_text("def bar():\n    return 2\n")
+    assert ingestor.ingest_directory(str(src)) == 1
+    assert len(ingestor.get_chunks()) == 1
+    assert 'foo' not in ingestor.function_index and 'bar' in ingestor.function_index
+    state_path = str(tmp_path / "state.pkl")
+    ingestor.save_state(state_path)
+    restored = CodebaseIngestor()
+    assert restored.load_state(state_path)
+    assert restored.get_chunks() == ingestor.get_chunks()
+    assert restored.get_related_chunks({'metadata': {'calls': ['bar']}})[0]['content'].startswith('def bar')
+
+def test_chunk_cache_reused_after_rename(tmp_path, monkeypatch):
+    (tmp_path / "old.py").write_text("def moved():\n    pass\n")
+    CodebaseIngestor().ingest_directory(str(tmp_path))
+    (tmp_path / "old.py").rename(tmp_path / "new.py")
+    chunked = []
+    chunk_file = ingestor.chunk_file
+    monkeypatch.setattr(ingestor, 'chunk_file', lambda path, *args: chunked.append(path) or chunk_file(path, *args))
+    codebase = CodebaseIngestor()
+    codebase.ingest_directory(str(tmp_path))
+    codebase.ingest_file(str(tmp_path / "new.py"))
+    assert chunked == []
+    assert [c['metadata']['file_path'] for c in codebase.get_chunks()] == [str(tmp_path / "new.py")]
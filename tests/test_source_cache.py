@@ -0,0 +1,22 @@
+import sys
+import os
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+from source_cache import get_cache_key, load_cached, store_cached
+
+def test_store_and_load_roundtrip(tmp_path):
+    key = get_cache_key("3.11", "def foo():\n    return 42\n")
+    assert load_cached(str(tmp_path), key) is None
+    chunks = [{'content': 'def foo():\n    return 42', 'metadata': {'chunk_index': 0}}]
+    store_cached(str(tmp_path), key, chunks)
+    assert load_cached(str(tmp_path), key) == chunks
+
+def test_eviction_keeps_most_recent(tmp_path):
+    for i in range(5):
+        key = get_cache_key(str(i))
+        store_cached(str(tmp_path), key, i)
+        os.utime(tmp_path / f"{key}.pkl", (i, i))
+    store_cached(str(tmp_path), get_cache_key("new"), "new", max_entries=3)
+    assert len(list(tmp_path.glob('*.pkl'))) == 3
+    assert load_cached(str(tmp_path), get_cache_key("new")) == "new"
+    assert load_cached(str(tmp_path), get_cache_key("0")) is None
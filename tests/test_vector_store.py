@@ -2,16 +2,40 @@ import sys
 import os
 import pytest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
-from vector_store import ChromaVectorStore
+import numpy as np
+import threading
+from vector_store import ChromaVectorStore, QueryBatcher, _QueryCache, _apply_hnsw_search_settings
 
 def test_chroma_add_and_query(monkeypatch):
     # Monkeypatch chromadb for test
     class DummyCollection:
         def __init__(self):
             self.docs = []
-        def add(self, ids, documents, metadatas):
-            self.docs = list(zip(ids, documents, metadatas))
-        def query(self, query_texts, n_results):
+        def add(self, ids, documents, metadatas, embeddings=None):
+            self.docs.extend(zip(ids, documents, metadatas))
+        def count(self):
+            return len(self.docs)
+        def get(self, ids=None, where=None, include=None):
+            docs = self.docs
+            if ids is not None:
+                wanted = set(ids)
+                docs = [d for d in docs if d[0] in wanted]
+            if where is not None:
+                paths = where['file_path']
+                paths = set(paths['$in']) if isinstance(paths, dict) else {paths}
+                docs = [d for d in docs if d[2].get('file_path') in paths]
+            return {'ids': [d[0] for d in docs], 'metadatas': [d[2] for d in docs]}
+        def delete(self, ids):
+            unwanted = set(ids)
+            self.docs = [d for d in self.docs if d[0] not in unwanted]
+        def update(self, ids, metadatas):
+            new_meta = dict(zip(ids, metadatas))
+            self.docs = [(i, doc, new_meta.get(i, meta)) for i, doc, meta in self.docs]
+        def upsert(self, ids, documents, metadatas, embeddings=None):
+            existing = set(ids)
+            self.docs = [d for d in self.docs if d[0] not in existing]
+            self.add(ids, documents, metadatas, embeddings)
+        def query(self, query_embeddings, n_results):
             return {
                 'documents': [[doc for _, doc, _ in self.docs[:n_results]]],
                 'metadatas': [[meta for _, _, meta in self.docs[:n_results]]],
@@ -22,9 +46,11 @@ def test_chroma_add_and_query(monkeypatch):
             return DummyCollection()
         def delete_collection(self, name):
             pass
+    monkeypatch.setattr("vector_store.get_embeddings", lambda texts: [[0.1, 0.2]] * len(texts))
+    monkeypatch.setattr("vector_store.get_embedding", lambda text: [0.1, 0.2])
     monkeypatch.setattr("vector_store.chromadb", type('chromadb', (), {}))
-    monkeypatch.setattr("vector_store.chromadb.Client", lambda *a, **kw: DummyClient())
-    monkeypatch.setattr("vector_store.chromadb.config", type('config', (), {'Settings': lambda **kw: {}}))
+    monkeypatch.setattr("vector_store.chromadb.Client", lambda *a, **kw: DummyClient(), raising=False)
+    monkeypatch.setattr("vector_store.chromadb.config", type('config', (), {'Settings': lambda **kw: {}}), raising=False)
     store = ChromaVectorStore()
     chunks = [{
         'content': 'def foo():\n    return 42',
@@ -35,3 +61,119 @@ def test_chroma_add_and_query(monkeypatch):
     results = store.query('foo', top_k=1)
     assert len(results) == 1
     assert 'foo' in results[0]['content']
+    columns = store.query_columnar('foo', top_k=1)
+    assert columns['contents'] == (results[0]['content'],)
+    assert columns['similarity_scores'].tolist() == [results[0]['similarity_score']]
+    with pytest.raises(ValueError):
+        columns['similarity_scores'] *= 2
+    # Rows are copies, so editing one leaves later cache hits intact
+    results[0]['metadata']['chunk_index'] = 99
+    assert store.query('foo', top_k=1)[0]['metadata']['chunk_index'] == 0
+    assert store.query('foo', top_k=0) == []
+    # Re-adding an edited file drops its old chunks and refreshes metadata of unchanged ones
+    edited = [
+        {'content': 'def bar():\n    return 1', 'metadata': {'file_path': 'sample.py', 'chunk_index': 0}},
+        {'content': 'def foo():\n    return 42', 'metadata': {'file_path': 'sample.py', 'chunk_index': 1}},
+    ]
+    assert store.add_documents(edited) == 1
+    stored = store.collection.get(where={'file_path': 'sample.py'})
+    assert len(stored['ids']) == 2
+    assert sorted(m['chunk_index'] for m in stored['metadatas']) == [0, 1]
+    edited.pop(0)
+    store.add_documents(edited)
+    assert len(store.collection.get(where={'file_path': 'sample.py'})['ids']) == 1
+
+def test_query_cache_exact_and_semantic_hits():
+    cache = _QueryCache(max_entries=2, threshold=0.95)
+    results = [{'content': 'def foo(): pass', 'metadata': {}, 'similarity_score': 0.9}]
+    cache.put('what does foo do', np.array([1.0, 0.0], dtype=np.float32), 5, results)
+    assert cache.get_exact('what does foo do', 5) is results
+    assert cache.get_exact('what does foo do', 3) is None
+    near = np.array([0.99, 0.141], dtype=np.float32)
+    assert cache.get_similar(near / np.linalg.norm(near), 5) is results
+    assert cache.get_similar(np.array([0.0, 1.0], dtype=np.float32), 5) is None
+    cache.put('a', np.array([0.0, 1.0], dtype=np.float32), 5, [])
+    cache.put('b', np.array([0.6, 0.8], dtype=np.float32), 5, [])
+    assert cache.get_exact('what does foo do', 5) is None
+    cache.clear()
+    assert cache.get_similar(np.array([0.0, 1.0], dtype=np.float32), 5) is None
+
+def test_query_batcher_coalesces_concurrent_queries():
+    calls = []
+    def query_fn(embeddings, n_results):
+        calls.append(len(embeddings))
+        return {
+            'documents': [[f"{e[0]}-{j}" for j in range(n_results)] for e in embeddings],
+            'distances': [[0.1] * n_results for _ in embeddings],
+        }
+    batcher = QueryBatcher(query_fn, window_ms=50)
+    results = {}
+    def run(i):
+        results[i] = batcher.submit([i], top_k=1 + i % 2)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(calls) == 8 and len(calls) < 8
+    assert results[3]['documents'] == [['3-0', '3-1']]
+    assert results[4]['documents'] == [['4-0']]
+    assert results[4]['metadatas'] is None
+
+def test_query_batcher_survives_bad_results_and_closes():
+    batcher = QueryBatcher(lambda embeddings, n_results: {'documents': [None]}, window_ms=1)
+    with pytest.raises(TypeError):
+        batcher.submit([0.0], top_k=1)
+    # The worker outlives the failed batch
+    with pytest.raises(TypeError):
+        batcher.submit([0.0], top_k=1)
+    thread = batcher._thread
+    batcher.close()
+    assert not thread.is_alive()
+
+@pytest.mark.parametrize('dtype', ['f16', 'i8'])
+def test_usearch_add_query_restore_and_delete(tmp_path, monkeypatch, dtype):
+    pytest.importorskip("usearch")
+    import vector_store
+    from vector_store import UsearchVectorStore
+    words = ['alpha', 'beta', 'gamma', 'delta']
+    embed = lambda text: [float(text.count(w)) for w in words] + [0.1]
+    monkeypatch.setattr(vector_store, 'get_embeddings', lambda texts: [embed(t) for t in texts])
+    monkeypatch.setattr(vector_store, 'get_embedding', embed)
+    vector_store._embed_query.cache_clear()
+    chunks = [
+        {'content': 'alpha alpha', 'metadata': {'file_path': 'a.py', 'start_line': 1}},
+        {'content': 'beta beta', 'metadata': {'file_path': 'a.py', 'start_line': 5}},
+        {'content': 'gamma gamma', 'metadata': {'file_path': 'b.py', 'start_line': 1}},
+    ]
+    store = UsearchVectorStore(str(tmp_path))
+    store.dtype = dtype
+    assert store.add_documents(chunks) == 3
+    results = store.query('beta', top_k=1)
+    assert results[0]['content'] == 'beta beta' and results[0]['metadata']['start_line'] == 5
+    assert results[0]['similarity_score'] == pytest.approx(1.0, abs=0.05)
+    # Re-adding only refreshes moved metadata and replaces outdated chunks of the same file
+    moved = dict(chunks[0], metadata={'file_path': 'a.py', 'start_line': 2})
+    assert store.add_documents([moved, {'content': 'delta', 'metadata': {'file_path': 'a.py'}}]) == 1
+    assert store.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] == 3
+    # A new store on the same directory restores the saved index and sidecar
+    restored = UsearchVectorStore(str(tmp_path))
+    columns = restored.query_columnar('alpha', top_k=3)
+    assert columns['contents'][0] == 'alpha alpha' and columns['metadatas'][0]['start_line'] == 2
+    assert sorted(columns['contents']) == ['alpha alpha', 'delta', 'gamma gamma']
+    restored.delete_all()
+    assert restored.query('alpha') == []
+    assert not os.path.exists(restored.index_path)
+
+def test_hnsw_search_settings_reach_existing_collections():
+    class PersistedCollection:
+        name = 'code_docs'
+        configuration = {'hnsw': {'ef_search': 100, 'max_neighbors': 16, 'ef_construction': 100}}
+        def modify(self, configuration):
+            self.configuration = {'hnsw': dict(self.configuration['hnsw'], **configuration['hnsw'])}
+    collection = PersistedCollection()
+    _apply_hnsw_search_settings(collection)
+    import vector_store
+    assert collection.configuration['hnsw']['ef_search'] == vector_store.settings.hnsw_search_ef
+    # Build-time parameters are left alone; they need a rebuild
+    assert collection.configuration['hnsw']['max_neighbors'] == 16